@@ -1,15 +1,43 @@
 # environment.py
 
+import numpy as np
+
 from mdp_components import (
     HoleCards, AgentState, PokerAction, ActionType, action_dict_to_poker_action
 )
 from utils import (
     shuffle_deck, deal, calculate_equity, classify_hand,
     calculate_reward_no_fold, calculate_reward_fold,
-    get_available_actions, BB_actions,
+    get_available_actions, BB_actions, OPPONENT,
     get_state, get_state_vector_for_deep_rl  # Assuming these functions exist in utils.
 )
 
+# Labels for the features of get_state_vector_for_deep_rl, in vector order.
+FEATURE_LABELS = (
+    "Position Encoding (1=BTN, 0=BB)",
+    "Estimated Equity",
+    "Is Suited (0/1)",
+    "Is Pair (0/1)",
+    "Is Connected (0/1)",
+    "Premium Hand Indicator (>0.70 equity)",
+    "Premium Pair Indicator (AA/KK/QQ)",
+    "Own Stack (Normalized / 100)",
+    "Opponent Stack (Normalized / 100)",
+    "Pot Size (Normalized / 100)",
+    "Stack-to-Pot Ratio (SPR)",
+    "Current Bet-to-Call (Normalized / 100)",
+    "Last Raise Size (Normalized / 100)",
+    "Implied Probability",
+    "BTN Aggression",
+    "BB Aggression",
+    "Number of Raises (Normalized / 5)",
+    "Is First Action (0/1)"
+)
+
+# Converted legal action lists keyed by the action generator arguments (see
+# PreflopHeadsUpEnv.get_current_legal_actions).
+_LEGAL_ACTIONS_CACHE = {}
+
 class PreflopHeadsUpEnv:
     """
     Environment to simulate a heads-up pre-flop Texas Hold'em hand.
@@ -32,12 +60,15 @@ class PreflopHeadsUpEnv:
       the turn passes to the opponent and available actions are recalculated.
     """
     
-    def __init__(self, default_stack=100, btn_post=0.5, bb_post=1):
+    def __init__(self, default_stack=100, btn_post=0.5, bb_post=1, use_local_equity=False, seed=None):
         self.default_stack = default_stack
         self.btn_post = btn_post   # BTN posts 0.5
         self.bb_post = bb_post     # BB posts 1
+        self.use_local_equity = use_local_equity  # Force in-process equity estimates (otherwise only used if the service is unreachable)
         self.players = {}          # Dictionary with player's stack and position
+        self.stacks = {}           # Position -> current stack, kept in sync with players (as get_state expects)
         self.deck = []             # The deck of cards
+        self.deck_rng = np.random.default_rng(seed)  # Shuffles the deck; pass a seed for reproducible deals
         self.hands = None          # Tuple of dealt hands (BTN_hand, BB_hand)
         self.contributions = {}    # Dictionary of contributions for the current hand
         self.pot = 0               # Total chips in the pot (sum of contributions)
@@ -45,11 +76,16 @@ class PreflopHeadsUpEnv:
         self.current_bet = 0       # The highest bet required to call
         self.current_turn = None   # Which player's turn: "BTN" or "BB"
         self.last_raise_size = None  # Size of the last raise
+        self.has_raise = False     # Whether any raise has been made this hand
         self.is_preflop = True     # Flag indicating the preflop betting round
         
         # Flag to signal that BTN’s first action was a call meeting the exact amount
         # (i.e., 0.5 to call) so that BB should use its dedicated actions.
         self.use_bb_actions = False
+        
+        # Legal actions for the current decision, computed on first request and
+        # cleared whenever the hand state changes (reset/step).
+        self._legal_actions = None
 
     def reset(self):
         """
@@ -65,18 +101,21 @@ class PreflopHeadsUpEnv:
             "BTN": {"stack": self.default_stack - self.btn_post, "position": "BTN"},
             "BB":  {"stack": self.default_stack - self.bb_post, "position": "BB"}
         }
+        self.stacks = {"BTN": self.players["BTN"]["stack"], "BB": self.players["BB"]["stack"]}
         self.contributions = {"BTN": self.btn_post, "BB": self.bb_post}
         self.pot = self.contributions["BTN"] + self.contributions["BB"]
         self.current_bet = self.bb_post  # The current highest bet is BB's blind (1).
         self.betting_history = []
         self.current_turn = "BTN"
         self.last_raise_size = None
+        self.has_raise = False
         self.is_preflop = True
         
         # Reset the special flag.
         self.use_bb_actions = False
+        self._legal_actions = None
         
-        self.deck = shuffle_deck()
+        self.deck = shuffle_deck(self.deck_rng)
         self.hands = deal(self.deck)
         return self.players, self.hands
 
@@ -96,15 +135,70 @@ class PreflopHeadsUpEnv:
                 - info: Dictionary with updated state information.
                 - done (bool): Whether the hand is over.
         """
-        current_player = self.current_turn
-        opponent = "BB" if current_player == "BTN" else "BTN"
+        handler = self._ACTION_HANDLERS.get(action.action_type)
+        if handler is None:
+            raise ValueError("Invalid action type.")
         
-        # --- Handle Fold ---
-        if action.action_type == ActionType.FOLD:
-            self.betting_history.append({"player": current_player, "action": "fold"})
-            reward_BTN, reward_BB = calculate_reward_fold(current_player, self.contributions)
+        current_player = self.current_turn
+        self._legal_actions = None
+        return handler(self, action, current_player, OPPONENT[current_player])
+
+    def _handle_fold(self, action, current_player, opponent):
+        """Ends the hand with the current player folding."""
+        self.betting_history.append({"player": current_player, "action": "fold"})
+        reward_BTN, reward_BB = calculate_reward_fold(current_player, self.contributions)
+        info = {
+            "terminal_reason": "fold",
+            "action_by": current_player,
+            "betting_history": self.betting_history,
+            "players": self.players,
+            "contributions": self.contributions,
+            "hands": self.hands
+        }
+        done = True
+        return (reward_BTN, reward_BB), info, done
+
+    def _handle_call_or_check(self, action, current_player, opponent):
+        """Applies a call or check, ending the hand if it closes the action."""
+        additional = 0
+        if action.action_type == ActionType.CALL:
+            additional = self.current_bet - self.contributions[current_player]
+            additional = max(additional, 0)
+            self.betting_history.append({
+                "player": current_player, "action": "call", "amount": self.current_bet
+            })
+        else:
+            self.betting_history.append({
+                "player": current_player, "action": "check"
+            })
+
+        # Update player's stack and contribution.
+        self.players[current_player]["stack"] -= additional
+        self.stacks[current_player] = self.players[current_player]["stack"]
+        self.contributions[current_player] += additional
+        self.pot = self.contributions["BTN"] + self.contributions["BB"]
+
+        # --- Special logic for BTN's first action ---
+        if current_player == "BTN" and len(self.betting_history) == 1 and action.action_type == ActionType.CALL:
+            expected_call = self.bb_post - self.btn_post  # Expected: 1 - 0.5 = 0.5.
+            if abs(additional - expected_call) < 1e-6:
+                self.use_bb_actions = True
+
+        # --- Determine if hand should terminate ---
+        hand_terminates = False
+        if self.is_preflop and action.action_type == ActionType.CHECK and current_player == "BB":
+            hand_terminates = True
+        # A call facing any earlier raise closes the action.
+        if self.has_raise and action.action_type == ActionType.CALL:
+            hand_terminates = True
+
+        if hand_terminates:
+            equity_BTN, equity_BB = calculate_equity(
+                self.hands[0], self.hands[1], use_local=self.use_local_equity
+            )
+            reward_BTN, reward_BB = calculate_reward_no_fold(equity_BTN, equity_BB, self.contributions)
             info = {
-                "terminal_reason": "fold",
+                "terminal_reason": "call/check",
                 "action_by": current_player,
                 "betting_history": self.betting_history,
                 "players": self.players,
@@ -113,103 +207,62 @@ class PreflopHeadsUpEnv:
             }
             done = True
             return (reward_BTN, reward_BB), info, done
-
-        # --- Handle Call or Check ---
-        elif action.action_type in [ActionType.CALL, ActionType.CHECK]:
-            additional = 0
-            if action.action_type == ActionType.CALL:
-                additional = self.current_bet - self.contributions[current_player]
-                additional = max(additional, 0)
-                self.betting_history.append({
-                    "player": current_player, "action": "call", "amount": self.current_bet
-                })
-            else:
-                self.betting_history.append({
-                    "player": current_player, "action": "check"
-                })
-            
-            # Update player's stack and contribution.
-            self.players[current_player]["stack"] -= additional
-            self.contributions[current_player] += additional
-            self.pot = self.contributions["BTN"] + self.contributions["BB"]
-
-            # --- Special logic for BTN's first action ---
-            if current_player == "BTN" and len(self.betting_history) == 1 and action.action_type == ActionType.CALL:
-                expected_call = self.bb_post - self.btn_post  # Expected: 1 - 0.5 = 0.5.
-                if abs(additional - expected_call) < 1e-6:
-                    self.use_bb_actions = True
-
-            # --- Determine if hand should terminate ---
-            hand_terminates = False
-            if self.is_preflop and action.action_type == ActionType.CHECK and current_player == "BB":
-                hand_terminates = True
-            if len(self.betting_history) >= 2:
-                had_raise = any(a['action'] == 'raise' for a in self.betting_history[:-1])
-                if had_raise and action.action_type == ActionType.CALL:
-                    hand_terminates = True
-
-            if hand_terminates:
-                equity_BTN, equity_BB = calculate_equity(self.hands[0], self.hands[1])
-                reward_BTN, reward_BB = calculate_reward_no_fold(equity_BTN, equity_BB, self.contributions)
-                info = {
-                    "terminal_reason": "call/check",
-                    "action_by": current_player,
-                    "betting_history": self.betting_history,
-                    "players": self.players,
-                    "contributions": self.contributions,
-                    "hands": self.hands
-                }
-                done = True
-                return (reward_BTN, reward_BB), info, done
-            else:
-                self.current_turn = opponent
-                info = {
-                    "terminal_reason": None,
-                    "action_by": current_player,
-                    "betting_history": self.betting_history,
-                    "players": self.players,
-                    "contributions": self.contributions,
-                    "current_bet": self.current_bet,
-                    "use_bb_actions": self.use_bb_actions
-                }
-                done = False
-                return (0, 0), info, done
-
-        # --- Handle Raise ---
-        elif action.action_type == ActionType.RAISE:
-            raise_amount = action.raise_amount  # The new total bet for the current player.
-            if raise_amount <= self.current_bet:
-                raise ValueError("Raise amount must exceed the current bet.")
-
-            additional = raise_amount - self.contributions[current_player]
-            if additional > self.players[current_player]["stack"]:
-                additional = self.players[current_player]["stack"]
-                raise_amount = self.contributions[current_player] + additional
-
-            self.last_raise_size = raise_amount - self.current_bet
-            self.players[current_player]["stack"] -= additional
-            self.contributions[current_player] += additional
-            self.pot = self.contributions["BTN"] + self.contributions["BB"]
-            self.current_bet = raise_amount
-
-            self.betting_history.append({
-                "player": current_player, "action": "raise", "amount": raise_amount
-            })
+        else:
             self.current_turn = opponent
-
             info = {
                 "terminal_reason": None,
                 "action_by": current_player,
                 "betting_history": self.betting_history,
                 "players": self.players,
                 "contributions": self.contributions,
-                "current_bet": self.current_bet
+                "current_bet": self.current_bet,
+                "use_bb_actions": self.use_bb_actions
             }
             done = False
             return (0, 0), info, done
 
-        else:
-            raise ValueError("Invalid action type.")
+    def _handle_raise(self, action, current_player, opponent):
+        """Applies a raise to the new total bet in action.raise_amount."""
+        raise_amount = action.raise_amount  # The new total bet for the current player.
+        if raise_amount <= self.current_bet:
+            raise ValueError("Raise amount must exceed the current bet.")
+
+        additional = raise_amount - self.contributions[current_player]
+        if additional > self.players[current_player]["stack"]:
+            additional = self.players[current_player]["stack"]
+            raise_amount = self.contributions[current_player] + additional
+
+        self.last_raise_size = raise_amount - self.current_bet
+        self.players[current_player]["stack"] -= additional
+        self.stacks[current_player] = self.players[current_player]["stack"]
+        self.contributions[current_player] += additional
+        self.pot = self.contributions["BTN"] + self.contributions["BB"]
+        self.current_bet = raise_amount
+        self.has_raise = True
+
+        self.betting_history.append({
+            "player": current_player, "action": "raise", "amount": raise_amount
+        })
+        self.current_turn = opponent
+
+        info = {
+            "terminal_reason": None,
+            "action_by": current_player,
+            "betting_history": self.betting_history,
+            "players": self.players,
+            "contributions": self.contributions,
+            "current_bet": self.current_bet
+        }
+        done = False
+        return (0, 0), info, done
+
+    # Step handlers keyed by action type, so step() dispatches with a single lookup.
+    _ACTION_HANDLERS = {
+        ActionType.FOLD: _handle_fold,
+        ActionType.CALL: _handle_call_or_check,
+        ActionType.CHECK: _handle_call_or_check,
+        ActionType.RAISE: _handle_raise,
+    }
 
     def get_current_legal_actions(self):
         """
@@ -220,27 +273,42 @@ class PreflopHeadsUpEnv:
           - current_bet, player_stack, is_dealer, and opponent_contributions.
         
         The returned actions are converted from dictionaries (if needed) into PokerAction objects.
+        The list is cached until the next reset/step, so repeated calls for the same decision
+        (e.g. as next-state actions and then as the acting player's actions) return it directly.
         """
-        if self.current_turn == "BB" and self.use_bb_actions:
-            actions = BB_actions(
-                player_stack=self.players["BB"]["stack"],
-                opponent_contributions=self.contributions["BTN"]
-            )
+        if self._legal_actions is not None:
+            return self._legal_actions
+        
+        current_turn = self.current_turn
+        player_stack = self.players[current_turn]["stack"]
+        opponent_contributions = self.contributions[OPPONENT[current_turn]]
+        if current_turn == "BB" and self.use_bb_actions:
+            key = ("BB_actions", player_stack, opponent_contributions)
         else:
-            opponent = "BB" if self.current_turn == "BTN" else "BTN"
-            actions = get_available_actions(
-                current_bet=self.current_bet,
-                player_stack=self.players[self.current_turn]["stack"],
-                is_dealer=(self.current_turn == "BTN"),
-                opponent_contributions=self.contributions[opponent]
-            )
-        # Convert each action to a PokerAction if they are dictionaries.
-        converted_actions = []
-        for act in actions:
-            if isinstance(act, dict):
-                converted_actions.append(action_dict_to_poker_action(act))
+            key = (self.current_bet, player_stack, current_turn == "BTN", opponent_contributions)
+        
+        # The action generators are pure functions of these arguments, so the converted
+        # PokerAction lists are shared across hands that reach the same decision point.
+        cached = _LEGAL_ACTIONS_CACHE.get(key)
+        if cached is None:
+            if key[0] == "BB_actions":
+                actions = BB_actions(player_stack=key[1], opponent_contributions=key[2])
             else:
-                converted_actions.append(act)
+                actions = get_available_actions(
+                    current_bet=key[0],
+                    player_stack=key[1],
+                    is_dealer=key[2],
+                    opponent_contributions=key[3]
+                )
+            # Convert each action to a PokerAction if they are dictionaries.
+            cached = tuple(
+                action_dict_to_poker_action(act) if isinstance(act, dict) else act
+                for act in actions
+            )
+            _LEGAL_ACTIONS_CACHE[key] = cached
+        
+        converted_actions = list(cached)
+        self._legal_actions = converted_actions
         return converted_actions
 
 
@@ -271,39 +339,17 @@ if __name__ == '__main__':
             state = get_state(
                 current_player,
                 player_hand,
-                {p: env.players[p]["stack"] for p in env.players},
+                env.stacks,
                 env.contributions,
                 env.betting_history,
                 is_first_action=(len(env.betting_history) == 0)
             )
             state_vector = get_state_vector_for_deep_rl(state)
             
-            # Label the features.
-            feature_labels = [
-                "Position Encoding (1=BTN, 0=BB)",
-                "Estimated Equity",
-                "Is Suited (0/1)",
-                "Is Pair (0/1)",
-                "Is Connected (0/1)",
-                "Premium Hand Indicator (>0.70 equity)",
-                "Premium Pair Indicator (AA/KK/QQ)",
-                "Own Stack (Normalized / 100)",
-                "Opponent Stack (Normalized / 100)",
-                "Pot Size (Normalized / 100)",
-                "Stack-to-Pot Ratio (SPR)",
-                "Current Bet-to-Call (Normalized / 100)",
-                "Last Raise Size (Normalized / 100)",
-                "Implied Probability",
-                "BTN Aggression",
-                "BB Aggression",
-                "Number of Raises (Normalized / 5)",
-                "Is First Action (0/1)"
-            ]
-            
             # Print the active player's state with labels.
             print(f"\nThis is the {current_player}'s state:")
             print("State Vector (features an RL agent would observe):")
-            for label, value in zip(feature_labels, state_vector):
+            for label, value in zip(FEATURE_LABELS, state_vector):
                 print(f"  {label}: {value}")
             print(f"Current Pot: {env.pot}")
             print(f"Current Bet: {env.current_bet}")
@@ -334,7 +380,7 @@ if __name__ == '__main__':
             print("\nAction processed. Updated state info:")
             print("Betting History:", env.betting_history)
             print("Current Contributions:", env.contributions)
-            print("Player Stacks:", {p: env.players[p]["stack"] for p in env.players})
+            print("Player Stacks:", env.stacks)
             print("Current Bet:", env.current_bet)
         
         # Hand is over; display final rewards.
@@ -0,0 +1,155 @@
+# local_equity.py
+
+import numpy as np
+
+# Cards are encoded as integers: card_id = rank_index * 4 + suit_index,
+# with ranks ordered "23456789TJQKA" and suits "hdcs".
+RANKS = "23456789TJQKA"
+SUITS = "hdcs"
+
+# Card string -> card id lookup, built once for all 52 cards.
+CARD_IDS = {rank + suit: r * 4 + s for r, rank in enumerate(RANKS) for s, suit in enumerate(SUITS)}
+
+# Hand categories, from weakest to strongest.
+HIGH_CARD, ONE_PAIR, TWO_PAIR, TRIPS, STRAIGHT, FLUSH, FULL_HOUSE, QUADS, STRAIGHT_FLUSH = range(9)
+
+_RANK_BITS = 1 << np.arange(13, dtype=np.int64)
+
+def _build_tables():
+    """
+    Precomputes lookups over all 13-bit rank masks (bit i set = rank i present):
+      - high_bit[mask]: index of the highest set bit (-1 for an empty mask).
+      - top_bits[k][mask]: the mask reduced to its k highest set bits.
+      - straight_high[mask]: rank index of the highest straight's top card (-1 if none).
+        The wheel (A-2-3-4-5) counts as a straight to the 5.
+    """
+    size = 1 << 13
+    high_bit = np.full(size, -1, dtype=np.int64)
+    top_bits = np.zeros((6, size), dtype=np.int64)
+    straight_high = np.full(size, -1, dtype=np.int64)
+    wheel = (1 << 12) | 0b1111
+    for mask in range(1, size):
+        high_bit[mask] = mask.bit_length() - 1
+        kept, remaining = 0, mask
+        for k in range(1, 6):
+            if remaining:
+                top = 1 << (remaining.bit_length() - 1)
+                kept |= top
+                remaining ^= top
+            top_bits[k, mask] = kept
+        for high in range(12, 3, -1):
+            window = 0b11111 << (high - 4)
+            if mask & window == window:
+                straight_high[mask] = high
+                break
+        else:
+            if mask & wheel == wheel:
+                straight_high[mask] = 3
+    return high_bit, top_bits, straight_high
+
+_HIGH_BIT, _TOP_BITS, _STRAIGHT_HIGH = _build_tables()
+
+def _bit(rank):
+    """Returns 1 << rank element-wise, or 0 where rank is -1."""
+    return np.where(rank >= 0, 1 << np.maximum(rank, 0), 0)
+
+def evaluate_seven(cards):
+    """
+    Scores a batch of seven-card hands. Higher scores are stronger hands and equal
+    scores are exact ties.
+
+    Args:
+        cards (np.ndarray): Integer card ids with shape (N, 7).
+
+    Returns:
+        np.ndarray: An int64 score per hand, shape (N,).
+    """
+    ranks = cards // 4
+    suits = cards % 4
+
+    # Per-rank counts and per-suit rank masks.
+    counts = (ranks[:, :, None] == np.arange(13)).sum(axis=1)
+    suit_hits = suits[:, :, None] == np.arange(4)
+    suit_counts = suit_hits.sum(axis=1)
+    suit_masks = (suit_hits * _RANK_BITS[ranks][:, :, None]).sum(axis=1)
+
+    present = (counts > 0) @ _RANK_BITS
+    pairs = (counts == 2) @ _RANK_BITS
+    trips = (counts == 3) @ _RANK_BITS
+    quads = (counts == 4) @ _RANK_BITS
+
+    # At most one suit can hold five or more of seven cards.
+    flush_suit = suit_counts.argmax(axis=1)
+    has_flush = suit_counts.max(axis=1) >= 5
+    flush_mask = np.where(has_flush, suit_masks[np.arange(len(cards)), flush_suit], 0)
+    straight_flush_high = _STRAIGHT_HIGH[flush_mask]
+    straight_high = _STRAIGHT_HIGH[present]
+
+    quad_rank = _HIGH_BIT[quads]
+    trip_rank = _HIGH_BIT[trips]
+    # A second set of trips plays as the pair of a full house.
+    full_pair_rank = _HIGH_BIT[(trips | pairs) & ~_bit(trip_rank)]
+    pair_rank = _HIGH_BIT[pairs]
+    second_pair_rank = _HIGH_BIT[pairs & ~_bit(pair_rank)]
+
+    # Score layout: category << 26 | primary rank << 17 | secondary rank << 13 | kicker mask.
+    def score(category, primary=0, secondary=0, kickers=0):
+        return (category << 26) | (primary << 17) | (secondary << 13) | kickers
+
+    conditions = [
+        straight_flush_high >= 0,
+        quad_rank >= 0,
+        (trip_rank >= 0) & (full_pair_rank >= 0),
+        has_flush,
+        straight_high >= 0,
+        trip_rank >= 0,
+        second_pair_rank >= 0,
+        pair_rank >= 0,
+    ]
+    choices = [
+        score(STRAIGHT_FLUSH, straight_flush_high),
+        score(QUADS, quad_rank, kickers=_TOP_BITS[1][present & ~_bit(quad_rank)]),
+        score(FULL_HOUSE, trip_rank, full_pair_rank),
+        score(FLUSH, kickers=_TOP_BITS[5][flush_mask]),
+        score(STRAIGHT, straight_high),
+        score(TRIPS, trip_rank, kickers=_TOP_BITS[2][present & ~_bit(trip_rank)]),
+        score(TWO_PAIR, pair_rank, second_pair_rank,
+              _TOP_BITS[1][present & ~_bit(pair_rank) & ~_bit(second_pair_rank)]),
+        score(ONE_PAIR, pair_rank, kickers=_TOP_BITS[3][present & ~_bit(pair_rank)]),
+    ]
+    return np.select(conditions, choices, default=score(HIGH_CARD, kickers=_TOP_BITS[5][present]))
+
+def monte_carlo_equity(player1_hand, player2_hand, iterations=20000, rng=None):
+    """
+    Estimates pre-flop equities for two hands in-process by dealing random boards,
+    without calling the Node.js equity calculator service. Ties count as half a win
+    for each player.
+
+    Args:
+        player1_hand (str): Player 1's hand, e.g., "AcKh"
+        player2_hand (str): Player 2's hand, e.g., "QsJd"
+        iterations (int): Number of random boards to deal.
+        rng (np.random.Generator): Optional generator, e.g. for reproducible results.
+
+    Returns:
+        tuple: (player1_equity, player2_equity) as decimals rounded to 3 places.
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+
+    hole1 = [CARD_IDS[player1_hand[0:2]], CARD_IDS[player1_hand[2:4]]]
+    hole2 = [CARD_IDS[player2_hand[0:2]], CARD_IDS[player2_hand[2:4]]]
+    dead = set(hole1) | set(hole2)
+    remaining = np.array([c for c in range(52) if c not in dead])
+
+    # A random 5-card board per iteration: the positions of the 5 smallest of
+    # len(remaining) uniform draws form a uniformly random 5-subset.
+    picks = rng.random((iterations, len(remaining))).argpartition(5, axis=1)[:, :5]
+    boards = remaining[picks]
+
+    score1 = evaluate_seven(np.hstack([np.broadcast_to(hole1, (iterations, 2)), boards]))
+    score2 = evaluate_seven(np.hstack([np.broadcast_to(hole2, (iterations, 2)), boards]))
+
+    equity1 = ((score1 > score2).sum() + 0.5 * (score1 == score2).sum()) / iterations
+    equity1 = round(float(equity1), 3)
+    return equity1, round(1 - equity1, 3)
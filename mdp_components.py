@@ -78,19 +78,23 @@ class PokerAction:
         action_type: One of FOLD, CALL, CHECK, or RAISE.
         raise_amount: For RAISE actions, this indicates the raise size (in BB units or the all-in amount).
                       For non-raise actions, this value is None.
+        type_value: action_type.value, resolved once at construction (e.g. "raise").
     """
+    __slots__ = ("action_type", "raise_amount", "type_value")
+
     def __init__(self, action_type: ActionType, raise_amount: Optional[float] = None):
         self.action_type = action_type
         self.raise_amount = raise_amount
+        self.type_value = action_type.value
 
     def __repr__(self):
         if self.action_type == ActionType.RAISE:
             return f"PokerAction(RAISE, {self.raise_amount})"
-        return f"PokerAction({self.action_type.value})"
+        return f"PokerAction({self.type_value})"
 
     def to_dict(self):
         """Convert PokerAction to dictionary format compatible with utils module"""
-        result = {'action_type': self.action_type.value}
+        result = {'action_type': self.type_value}
         if self.raise_amount is not None:
             result['raise_amount'] = self.raise_amount
         return result
@@ -0,0 +1,34 @@
+# precompute_equity.py
+
+import pickle
+import time
+
+from utils import canonical_matchups, calculate_equity_batch, EQUITY_TABLE_PATH, EQUITY_TABLE_SOURCE
+
+# ----- Configuration Parameters -----
+BATCH_SIZE = 1000         # Matchups sent to the equity service per request.
+LOG_INTERVAL = 10         # Report progress every this many batches.
+
+# Every preflop matchup is equivalent to one of these canonical matchups, so
+# computing each once covers every deal (see utils._canonical_matchup).
+# calculate_equity_batch only returns exact service results and raises on any service
+# error, so a failed run stops here instead of writing a partial or estimated table.
+matchups = canonical_matchups()
+print(f"Computing equities for {len(matchups)} canonical matchups...")
+
+equity_table = {}
+start_time = time.time()
+for batch_number, start in enumerate(range(0, len(matchups), BATCH_SIZE), start=1):
+    batch = matchups[start:start + BATCH_SIZE]
+    equity_table.update(zip(batch, calculate_equity_batch(batch)))
+    if batch_number % LOG_INTERVAL == 0:
+        elapsed = time.time() - start_time
+        print(f"{len(equity_table)}/{len(matchups)} matchups done, Time Elapsed = {elapsed:.1f}s")
+
+if len(equity_table) != len(matchups):
+    raise RuntimeError(f"Expected {len(matchups)} matchups but computed {len(equity_table)}.")
+
+# The source is recorded so utils only loads tables built from exact service results.
+with open(EQUITY_TABLE_PATH, "wb") as f:
+    pickle.dump({"source": EQUITY_TABLE_SOURCE, "equities": equity_table}, f)
+print("Equity table saved to", EQUITY_TABLE_PATH)
@@ -1,13 +1,18 @@
-import numpy as np
+import random
 from mdp_components import PokerAction, ActionType
 
 class QLearningAgent:
-    def __init__(self, alpha=0.1, gamma=0.95, epsilon=1.0, num_bins=10):
+    def __init__(self, alpha=0.1, gamma=0.95, epsilon=1.0, num_bins=10, seed=None):
         self.alpha = alpha          # Learning rate
         self.gamma = gamma          # Discount factor
         self.epsilon = epsilon      # Exploration rate
         self.num_bins = num_bins    # Number of bins per feature for discretization
         self.Q = {}                 # The Q-table. Keys will be tuples of (state, action)
+        # Per-agent generator for exploration; pass a seed for reproducible runs.
+        # Its bound methods are cached to skip attribute lookups on every decision.
+        self._rng = random.Random(seed)
+        self._rand = self._rng.random
+        self._choice = self._rng.choice
 
     def discretize_state(self, state_vector):
         """
@@ -24,9 +29,9 @@ class QLearningAgent:
         If the action is a raise, include the raise amount in the key.
         """
         if action.action_type == ActionType.RAISE:
-            return (action.action_type.value, action.raise_amount)
+            return (action.type_value, action.raise_amount)
         else:
-            return (action.action_type.value,)
+            return (action.type_value,)
 
     def choose_action(self, state_vector, legal_actions):
         """
@@ -34,9 +39,9 @@ class QLearningAgent:
         or exploiting the current Q-table.
         """
         state = self.discretize_state(state_vector)
-        if np.random.rand() < self.epsilon:
+        if self._rand() < self.epsilon:
             # Explore: select a random legal action.
-            action = np.random.choice(legal_actions)
+            action = self._choice(legal_actions)
         else:
             # Exploit: select the action with highest Q-value.
             best_action = None
@@ -49,7 +54,7 @@ class QLearningAgent:
                     best_action = action
             # Fall back to random if no action has been seen yet.
             if best_action is None:
-                best_action = np.random.choice(legal_actions)
+                best_action = self._choice(legal_actions)
             action = best_action
         return action
 
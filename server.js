@@ -4,36 +4,57 @@ import { CardGroup, OddsCalculator } from 'poker-odds-calculator';
 const app = express();
 const port = 3000;
 
-// Middleware to parse JSON bodies
-app.use(express.json());
+// Middleware to parse JSON bodies (batch requests can carry thousands of hands)
+app.use(express.json({ limit: '10mb' }));
+
+// Calculate the equities of two hands against each other
+function calculateEquity(player1Hand, player2Hand) {
+  // Create CardGroup objects from the provided hands
+  const player1Cards = CardGroup.fromString(player1Hand);
+  const player2Cards = CardGroup.fromString(player2Hand);
+
+  // Calculate equities for both players
+  const result = OddsCalculator.calculate([player1Cards, player2Cards]);
+
+  // Extract the equity values.
+  // Note: getEquity() is assumed to return a numeric value as a string.
+  const player1Equity = parseFloat(result.equities[0].getEquity());
+  const player2Equity = parseFloat(result.equities[1].getEquity());
+
+  return { player1Equity, player2Equity };
+}
 
 // Define the route to calculate poker equity
 app.post('/calculate-equity', (req, res) => {
   const { player1Hand, player2Hand } = req.body;
-  
+
   // Validate that both hands are provided
   if (!player1Hand || !player2Hand) {
     return res.status(400).json({ error: 'Missing player1Hand or player2Hand in request body' });
   }
 
   try {
-    // Create CardGroup objects from the provided hands
-    const player1Cards = CardGroup.fromString(player1Hand);
-    const player2Cards = CardGroup.fromString(player2Hand);
+    // Return the results as JSON
+    return res.json(calculateEquity(player1Hand, player2Hand));
+  } catch (error) {
+    console.error('Error calculating equity:', error);
+    return res.status(500).json({ error: 'Error calculating equity' });
+  }
+});
 
-    // Calculate equities for both players
-    const result = OddsCalculator.calculate([player1Cards, player2Cards]);
+// Define the route to calculate equity for many matchups in one request
+app.post('/calculate-equity-batch', (req, res) => {
+  const { jobs } = req.body;
 
-    // Extract the equity values.
-    // Note: getEquity() is assumed to return a numeric value as a string.
-    const player1Equity = parseFloat(result.equities[0].getEquity());
-    const player2Equity = parseFloat(result.equities[1].getEquity());
+  // Validate that every job provides both hands
+  if (!Array.isArray(jobs) || jobs.some(job => !job || !job.player1Hand || !job.player2Hand)) {
+    return res.status(400).json({ error: 'Request body must contain a jobs array of { player1Hand, player2Hand }' });
+  }
 
-    // Return the results as JSON
-    return res.json({
-      player1Equity,
-      player2Equity
-    });
+  try {
+    // Results are returned in the same order as the jobs
+    const results = jobs.map(job => calculateEquity(job.player1Hand, job.player2Hand));
+    return res.json({ results });
   } catch (error) {
     console.error('Error calculating equity:', error);
     return res.status(500).json({ error: 'Error calculating equity' });
@@ -41,6 +62,12 @@ app.post('/calculate-equity', (req, res) => {
 });
 
 // Start the server
-app.listen(port, () => {
+const server = app.listen(port, () => {
   console.log(`Equity calculator service listening on http://localhost:${port}`);
-});
\ No newline at end of file
+});
+
+// Keep idle client connections open between training calls (Node's default is 5s),
+// so the Python session's pooled sockets are reused instead of reconnecting.
+// headersTimeout must stay above keepAliveTimeout.
+server.keepAliveTimeout = 60000;
+server.headersTimeout = 65000;
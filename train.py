@@ -6,210 +6,264 @@ import matplotlib.pyplot as plt
 import time
 
 from environment import PreflopHeadsUpEnv
-from utils import get_state, get_state_vector_for_deep_rl, classify_hand
+from utils import get_state, get_state_vector_for_deep_rl, classify_hand, HAND_CLASSES, HAND_CLASS_INDEX
 from q_learning_agent import QLearningAgent  # Your Q-learning agent implementation
-from mdp_components import PokerAction
+from mdp_components import PokerAction, ActionType
 
 # ----- Configuration Parameters -----
 NUM_EPISODES = 5000       # Increase number of episodes for convergence.
 LOG_INTERVAL = 1000       # Log progress every this many episodes.
 EVAL_EPISODES = 50        # Number of evaluation episodes for performance measurement.
 PLOT_RESULTS = True       # Generate a plot at the end.
+USE_LOCAL_EQUITY = False  # Force in-process (Monte-Carlo) equities; otherwise used only if the Node.js service is unreachable.
+SEED = None               # Set to an int to reproduce a run's deals and exploration.
 QTABLE_SAVE_PATH = "q_tables.pkl"
 TRAINING_LOG_CSV = "training_log.csv"
 HAND_ACTION_STATS_SAVE_PATH = "hand_action_stats.pkl"
 HAND_REWARD_STATS_SAVE_PATH = "hand_reward_stats.pkl"
 
 # ----- Initialize Environment and Agents -----
-env = PreflopHeadsUpEnv()
+env = PreflopHeadsUpEnv(use_local_equity=USE_LOCAL_EQUITY, seed=SEED)
 
-# Create an agent for each position.
-btn_agent = QLearningAgent(alpha=0.1, gamma=0.95, epsilon=1.0, num_bins=10)
-bb_agent  = QLearningAgent(alpha=0.1, gamma=0.95, epsilon=1.0, num_bins=10)
+# Create an agent for each position, each with its own exploration seed.
+btn_agent = QLearningAgent(alpha=0.1, gamma=0.95, epsilon=1.0, num_bins=10,
+                           seed=None if SEED is None else SEED + 1)
+bb_agent  = QLearningAgent(alpha=0.1, gamma=0.95, epsilon=1.0, num_bins=10,
+                           seed=None if SEED is None else SEED + 2)
 
 # Metrics for monitoring performance.
-episode_rewards = []  # List storing (BTN_reward, BB_reward) per episode.
-btn_rewards = []      # Per-episode cumulative reward for BTN.
-bb_rewards = []       # Per-episode cumulative reward for BB.
+btn_rewards = np.empty(NUM_EPISODES)  # Per-episode cumulative reward for BTN (indexed by episode - 1).
+bb_rewards = np.empty(NUM_EPISODES)   # Per-episode cumulative reward for BB (indexed by episode - 1).
 eval_rewards = []     # Evaluation-phase rewards (to track greedy performance).
 
 # ----- Set Up Logging for Hand Action Statistics and Hand Reward Statistics -----
-# Separate dictionaries keyed by starting hand classification for each player.
-hand_action_stats = {"BTN": {}, "BB": {}}
-# For rewards, we will store cumulative reward and count per hand.
-hand_reward_stats = {"BTN": {}, "BB": {}}
-
-def update_hand_stats(player, hand, action: PokerAction):
+# For actions, keep a fixed counter per (position, starting hand class, action type),
+# stored as a flat list indexed by code; see hand_action_code.
+POSITIONS = ("BTN", "BB")
+ACTION_TYPES = ("fold", "call", "check", "raise")
+ACTION_TYPE_INDEX = {ActionType(action_type): i for i, action_type in enumerate(ACTION_TYPES)}
+hand_action_counts = [0] * (len(POSITIONS) * len(HAND_CLASSES) * len(ACTION_TYPES))
+# For rewards, record each episode's starting hand class and aggregate at the end.
+btn_hand_classes = np.empty(NUM_EPISODES, dtype=np.int64)
+bb_hand_classes = np.empty(NUM_EPISODES, dtype=np.int64)
+
+def hand_action_code(player, classified):
     """
-    Update action counts for a given starting hand.
+    Base code for a player's decisions with a given starting hand; adding the
+    action type's index (ACTION_TYPE_INDEX) gives the hand_action_counts index.
     - player: "BTN" or "BB"
-    - hand: Raw 4-character hand string (e.g., "AsAh").
+    - classified: Starting hand classification (e.g., "AA", "AKs").
+    """
+    return (POSITIONS.index(player) * len(HAND_CLASSES) + HAND_CLASS_INDEX[classified]) * len(ACTION_TYPES)
+
+def update_hand_stats(hand_code, action: PokerAction):
+    """
+    Record one action for a starting hand.
+    - hand_code: The player's hand_action_code for this episode.
     - action: The selected PokerAction.
     """
-    classified, _, _, _, _ = classify_hand(hand)
-    if classified not in hand_action_stats[player]:
-        hand_action_stats[player][classified] = {"fold": 0, "call": 0, "check": 0, "raise": 0}
-    hand_action_stats[player][classified][action.action_type.value] += 1
+    hand_action_counts[hand_code + ACTION_TYPE_INDEX[action.action_type]] += 1
 
-def update_hand_reward_stats(player, hand, reward_val):
+def build_hand_action_stats(flat_counts):
     """
-    Update reward statistics for a given starting hand.
-    - player: "BTN" or "BB"
-    - hand: Raw 4-character hand string.
-    - reward_val: Final reward earned in that episode.
+    Convert the flat action counters into action statistics per player and starting hand.
+    Returns {"BTN": {...}, "BB": {...}}, each keyed by hand classification with a
+    count per action type, containing only hands that took at least one action.
+    """
+    counts = np.array(flat_counts).reshape(len(POSITIONS), len(HAND_CLASSES), len(ACTION_TYPES))
+    return {
+        player: {
+            HAND_CLASSES[i]: dict(zip(ACTION_TYPES, map(int, counts[p, i])))
+            for i in np.flatnonzero(counts[p].sum(axis=1))
+        }
+        for p, player in enumerate(POSITIONS)
+    }
+
+def build_hand_reward_stats(hand_classes, rewards):
     """
-    classified, _, _, _, _ = classify_hand(hand)
-    if classified not in hand_reward_stats[player]:
-        hand_reward_stats[player][classified] = {"total_reward": 0.0, "count": 0}
-    hand_reward_stats[player][classified]["total_reward"] += reward_val
-    hand_reward_stats[player][classified]["count"] += 1
-
-# ----- Prepare Training Log CSV Header -----
-if not os.path.exists(TRAINING_LOG_CSV):
-    with open(TRAINING_LOG_CSV, mode='w', newline='') as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(["Episode", "BTN Reward", "BB Reward", "Eval BTN Reward", "Eval BB Reward", "Epsilon_BTN", "Epsilon_BB"])
+    Aggregate per-episode rewards into reward statistics per starting hand.
+    - hand_classes: Array of hand class indices (see HAND_CLASSES), one per episode.
+    - rewards: Final reward earned in each episode.
+    Returns a dict keyed by hand classification with "total_reward" and "count",
+    containing only hands that were dealt at least once.
+    """
+    counts = np.bincount(hand_classes, minlength=len(HAND_CLASSES))
+    totals = np.bincount(hand_classes, weights=rewards, minlength=len(HAND_CLASSES))
+    return {
+        HAND_CLASSES[i]: {"total_reward": float(totals[i]), "count": int(counts[i])}
+        for i in np.flatnonzero(counts)
+    }
+
+# ----- Open Training Log CSV -----
+# Opened once for the whole run; a header is written only when creating the file.
+write_log_header = not os.path.exists(TRAINING_LOG_CSV)
+log_file = open(TRAINING_LOG_CSV, mode='a', newline='')
+log_writer = csv.writer(log_file)
+if write_log_header:
+    log_writer.writerow(["Episode", "BTN Reward", "BB Reward", "Eval BTN Reward", "Eval BB Reward", "Epsilon_BTN", "Epsilon_BB"])
 
 # ----- Training Loop -----
 start_time = time.time()
-for episode in range(1, NUM_EPISODES + 1):
-    env.reset()
-    done = False
-    episode_btn_reward = 0.0
-    episode_bb_reward = 0.0
-
-    # The dealt hands remain fixed for the episode.
-    btn_hand = env.hands[0]
-    bb_hand = env.hands[1]
-
-    # Run the episode.
-    while not done:
-        current_player = env.current_turn  # "BTN" or "BB"
-        if current_player == "BTN":
-            agent = btn_agent
-            player_hand = btn_hand
-        else:
-            agent = bb_agent
-            player_hand = bb_hand
-
-        # Obtain the current state vector.
+try:
+    for episode in range(1, NUM_EPISODES + 1):
+        env.reset()
+        done = False
+        episode_btn_reward = 0.0
+        episode_bb_reward = 0.0
+
+        # The dealt hands remain fixed for the episode, so classify them once.
+        btn_hand = env.hands[0]
+        bb_hand = env.hands[1]
+        btn_classified = classify_hand(btn_hand)[0]
+        bb_classified = classify_hand(bb_hand)[0]
+        btn_hand_code = hand_action_code("BTN", btn_classified)
+        bb_hand_code = hand_action_code("BB", bb_classified)
+
+        # The environment mutates these containers in place during a hand, so bind them once.
+        stacks = env.stacks
+        contributions = env.contributions
+        betting_history = env.betting_history
+
+        # The state vector and legal actions are carried forward: the next state computed
+        # for each Q-update is the following decision's state.
+        first_player = env.current_turn
         state = get_state(
-            current_player,
-            player_hand,
-            {p: env.players[p]["stack"] for p in env.players},
-            env.contributions,
-            env.betting_history,
-            is_first_action=(len(env.betting_history) == 0)
+            first_player,
+            btn_hand if first_player == "BTN" else bb_hand,
+            stacks,
+            contributions,
+            betting_history,
+            is_first_action=not betting_history
         )
         state_vector = get_state_vector_for_deep_rl(state)
-
-        # Retrieve legal actions.
         legal_actions = env.get_current_legal_actions()
 
-        # Choose an action using the epsilon-greedy policy.
-        action = agent.choose_action(state_vector, legal_actions)
-
-        # Update hand-action statistics.
-        update_hand_stats(current_player, player_hand, action)
-
-        # Execute the action.
-        (reward_BTN, reward_BB), info, done = env.step(action)
-        reward = reward_BTN if current_player == "BTN" else reward_BB
-
-        # Accumulate episode reward for the acting player.
-        if current_player == "BTN":
-            episode_btn_reward += reward
-        else:
-            episode_bb_reward += reward
-
-        # Get next state info if the episode is not finished.
-        if not done:
-            next_player = env.current_turn
-            next_hand = btn_hand if next_player == "BTN" else bb_hand
-            next_state = get_state(
-                next_player,
-                next_hand,
-                {p: env.players[p]["stack"] for p in env.players},
-                env.contributions,
-                env.betting_history,
-                is_first_action=(len(env.betting_history) == 0)
-            )
-            next_state_vector = get_state_vector_for_deep_rl(next_state)
-            legal_actions_next = env.get_current_legal_actions()
-        else:
-            next_state_vector = None
-            legal_actions_next = []
-
-        # Update Q-table.
-        agent.update(state_vector, action, reward, next_state_vector, done, legal_actions_next)
-
-    # End of episode: record the final rewards.
-    episode_rewards.append((episode_btn_reward, episode_bb_reward))
-    btn_rewards.append(episode_btn_reward)
-    bb_rewards.append(episode_bb_reward)
-
-    # Update hand reward statistics per player (each hand is dealt once per episode).
-    update_hand_reward_stats("BTN", btn_hand, episode_btn_reward)
-    update_hand_reward_stats("BB", bb_hand, episode_bb_reward)
-
-    # Decay exploration rates.
-    btn_agent.decay_epsilon()
-    bb_agent.decay_epsilon()
-
-    # Log progress every LOG_INTERVAL episodes.
-    if episode % LOG_INTERVAL == 0:
-        avg_btn = np.mean(btn_rewards[-LOG_INTERVAL:])
-        avg_bb = np.mean(bb_rewards[-LOG_INTERVAL:])
-        elapsed = time.time() - start_time
-        print(f"Episode {episode}: Avg BTN Reward = {avg_btn:.2f}, Avg BB Reward = {avg_bb:.2f}, Time Elapsed = {elapsed:.1f}s, Epsilon = {btn_agent.epsilon:.3f}")
-        
-        # Evaluation phase (with ε=0, no exploration).
-        eval_btn_rewards = []
-        eval_bb_rewards = []
-        original_btn_epsilon = btn_agent.epsilon
-        original_bb_epsilon = bb_agent.epsilon
-        btn_agent.epsilon = 0.0
-        bb_agent.epsilon = 0.0
-        for _ in range(EVAL_EPISODES):
-            env.reset()
-            done_eval = False
-            eval_reward_BTN = 0.0
-            eval_reward_BB = 0.0
-            while not done_eval:
-                current_player = env.current_turn
-                if current_player == "BTN":
-                    eval_agent = btn_agent
-                    eval_hand = env.hands[0]
-                else:
-                    eval_agent = bb_agent
-                    eval_hand = env.hands[1]
-                eval_state = get_state(
-                    current_player,
-                    eval_hand,
-                    {p: env.players[p]["stack"] for p in env.players},
-                    env.contributions,
-                    env.betting_history,
-                    is_first_action=(len(env.betting_history) == 0)
+        # Run the episode.
+        while not done:
+            current_player = env.current_turn  # "BTN" or "BB"
+            if current_player == "BTN":
+                agent = btn_agent
+                player_hand_code = btn_hand_code
+            else:
+                agent = bb_agent
+                player_hand_code = bb_hand_code
+
+            # Choose an action using the epsilon-greedy policy.
+            action = agent.choose_action(state_vector, legal_actions)
+
+            # Update hand-action statistics.
+            update_hand_stats(player_hand_code, action)
+
+            # Execute the action.
+            (reward_BTN, reward_BB), info, done = env.step(action)
+            reward = reward_BTN if current_player == "BTN" else reward_BB
+
+            # Accumulate episode reward for the acting player.
+            if current_player == "BTN":
+                episode_btn_reward += reward
+            else:
+                episode_bb_reward += reward
+
+            # Get next state info if the episode is not finished.
+            if not done:
+                next_player = env.current_turn
+                next_hand = btn_hand if next_player == "BTN" else bb_hand
+                next_state = get_state(
+                    next_player,
+                    next_hand,
+                    stacks,
+                    contributions,
+                    betting_history,
+                    is_first_action=not betting_history
                 )
-                eval_state_vector = get_state_vector_for_deep_rl(eval_state)
-                eval_legal_actions = env.get_current_legal_actions()
-                eval_action = eval_agent.choose_action(eval_state_vector, eval_legal_actions)
-                (eval_r_BTN, eval_r_BB), _, done_eval = env.step(eval_action)
-                if current_player == "BTN":
-                    eval_reward_BTN += eval_r_BTN
-                else:
-                    eval_reward_BB += eval_r_BB
-            eval_btn_rewards.append(eval_reward_BTN)
-            eval_bb_rewards.append(eval_reward_BB)
-        avg_eval_btn = np.mean(eval_btn_rewards)
-        avg_eval_bb = np.mean(eval_bb_rewards)
-        print(f"Evaluation: Avg BTN Reward = {avg_eval_btn:.2f}, Avg BB Reward = {avg_eval_bb:.2f}")
-        with open(TRAINING_LOG_CSV, mode='a', newline='') as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow([episode, avg_btn, avg_bb, avg_eval_btn, avg_eval_bb, btn_agent.epsilon, bb_agent.epsilon])
-        # Restore exploration rates.
-        btn_agent.epsilon = original_btn_epsilon
-        bb_agent.epsilon = original_bb_epsilon
+                next_state_vector = get_state_vector_for_deep_rl(next_state)
+                legal_actions_next = env.get_current_legal_actions()
+            else:
+                next_state_vector = None
+                legal_actions_next = []
+
+            # Update Q-table.
+            agent.update(state_vector, action, reward, next_state_vector, done, legal_actions_next)
+            state_vector = next_state_vector
+            legal_actions = legal_actions_next
+
+        # End of episode: record the final rewards.
+        btn_rewards[episode - 1] = episode_btn_reward
+        bb_rewards[episode - 1] = episode_bb_reward
+
+        # Record the starting hands for the reward statistics (each hand is dealt once per episode).
+        btn_hand_classes[episode - 1] = HAND_CLASS_INDEX[btn_classified]
+        bb_hand_classes[episode - 1] = HAND_CLASS_INDEX[bb_classified]
+
+        # Decay exploration rates.
+        btn_agent.decay_epsilon()
+        bb_agent.decay_epsilon()
+
+        # Log progress every LOG_INTERVAL episodes.
+        if episode % LOG_INTERVAL == 0:
+            avg_btn = btn_rewards[episode - LOG_INTERVAL:episode].mean()
+            avg_bb = bb_rewards[episode - LOG_INTERVAL:episode].mean()
+            elapsed = time.time() - start_time
+            e_btn = btn_agent.epsilon
+            e_bb = bb_agent.epsilon
+            print(f"Episode {episode}: Avg BTN Reward = {avg_btn:.2f}, Avg BB Reward = {avg_bb:.2f}, Time Elapsed = {elapsed:.1f}s, Epsilon = {e_btn:.3f}")
+            
+            # Evaluation phase (with ε=0, no exploration).
+            eval_btn_rewards = []
+            eval_bb_rewards = []
+            btn_agent.epsilon = 0.0
+            bb_agent.epsilon = 0.0
+            for _ in range(EVAL_EPISODES):
+                env.reset()
+                done_eval = False
+                stacks = env.stacks
+                contributions = env.contributions
+                betting_history = env.betting_history
+                eval_reward_BTN = 0.0
+                eval_reward_BB = 0.0
+                while not done_eval:
+                    current_player = env.current_turn
+                    if current_player == "BTN":
+                        eval_agent = btn_agent
+                        eval_hand = env.hands[0]
+                    else:
+                        eval_agent = bb_agent
+                        eval_hand = env.hands[1]
+                    eval_state = get_state(
+                        current_player,
+                        eval_hand,
+                        stacks,
+                        contributions,
+                        betting_history,
+                        is_first_action=not betting_history
+                    )
+                    eval_state_vector = get_state_vector_for_deep_rl(eval_state)
+                    eval_legal_actions = env.get_current_legal_actions()
+                    eval_action = eval_agent.choose_action(eval_state_vector, eval_legal_actions)
+                    (eval_r_BTN, eval_r_BB), _, done_eval = env.step(eval_action)
+                    if current_player == "BTN":
+                        eval_reward_BTN += eval_r_BTN
+                    else:
+                        eval_reward_BB += eval_r_BB
+                eval_btn_rewards.append(eval_reward_BTN)
+                eval_bb_rewards.append(eval_reward_BB)
+            avg_eval_btn = np.mean(eval_btn_rewards)
+            avg_eval_bb = np.mean(eval_bb_rewards)
+            print(f"Evaluation: Avg BTN Reward = {avg_eval_btn:.2f}, Avg BB Reward = {avg_eval_bb:.2f}")
+            log_writer.writerow([episode, avg_btn, avg_bb, avg_eval_btn, avg_eval_bb, e_btn, e_bb])
+            log_file.flush()  # Keep the log current if training is interrupted.
+            # Restore exploration rates.
+            btn_agent.epsilon = e_btn
+            bb_agent.epsilon = e_bb
+finally:
+    log_file.close()
+
+# ----- Aggregate Hand-Action and Hand-Reward Stats -----
+hand_action_stats = build_hand_action_stats(hand_action_counts)
+hand_reward_stats = {
+    "BTN": build_hand_reward_stats(btn_hand_classes, btn_rewards),
+    "BB": build_hand_reward_stats(bb_hand_classes, bb_rewards),
+}
 
 # ----- Save Final Q-Tables, Hand-Action Stats, and Hand-Reward Stats -----
 q_tables = {"BTN": btn_agent.Q, "BB": bb_agent.Q}
@@ -275,8 +329,10 @@ print_hand_reward_stats(hand_reward_stats["BB"], "BB")
 # ----- Optionally Plot Training Performance -----
 if PLOT_RESULTS:
     episodes = np.arange(LOG_INTERVAL, NUM_EPISODES + 1, LOG_INTERVAL)
-    avg_btn_rewards = [np.mean([r[0] for r in episode_rewards[max(0, i - LOG_INTERVAL):i]]) for i in episodes]
-    avg_bb_rewards = [np.mean([r[1] for r in episode_rewards[max(0, i - LOG_INTERVAL):i]]) for i in episodes]
+    # The logging windows don't overlap, so average each one with a single reshape.
+    num_windows = len(episodes)
+    avg_btn_rewards = btn_rewards[:num_windows * LOG_INTERVAL].reshape(num_windows, LOG_INTERVAL).mean(axis=1)
+    avg_bb_rewards = bb_rewards[:num_windows * LOG_INTERVAL].reshape(num_windows, LOG_INTERVAL).mean(axis=1)
     plt.figure()
     plt.plot(episodes, avg_btn_rewards, label="BTN Avg Reward")
     plt.plot(episodes, avg_bb_rewards, label="BB Avg Reward")
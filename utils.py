@@ -1,16 +1,75 @@
 #utils.py
 
-import random
+import functools
+import os
+import pickle
+import numpy as np
 import requests
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from typing import Dict, List, Tuple, Optional, Any
 
+from local_equity import monte_carlo_equity
+
+try:
+    import orjson  # Optional: faster JSON encoding/decoding for equity service calls.
+except ImportError:
+    orjson = None
+
 # Action type constants
 ACTION_FOLD = "fold"
 ACTION_CALL = "call" 
 ACTION_CHECK = "check"
 ACTION_RAISE = "raise"
 
-def shuffle_deck():
+# Encoded action types used in the structured betting history (0 = no action).
+_ACTION_TYPE_CODE = {ACTION_FOLD: 1, ACTION_CHECK: 2, ACTION_CALL: 3, ACTION_RAISE: 4}
+
+# Allowed discrete targets for total contribution after a raise.
+_DISCRETE_TARGETS = (2, 3, 4, 5, 9, 15, 25, 50)
+
+# Non-raise action dicts returned by get_available_actions and BB_actions. They are
+# shared between calls, so callers must not modify them.
+_FOLD_ACTION = {'action_type': ACTION_FOLD}
+_CALL_ACTION = {'action_type': ACTION_CALL}
+_CHECK_ACTION = {'action_type': ACTION_CHECK}
+
+# Heads-up opponent of each position
+OPPONENT = {"BTN": "BB", "BB": "BTN"}
+
+# Shared HTTP session for the equity calculator service. Reusing it keeps the
+# connection to the Node.js server alive instead of reconnecting on every call.
+_equity_session = requests.Session()
+_equity_session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=16))
+
+# Equity calculator service endpoints and request headers, built once.
+EQUITY_SERVICE_URL = "http://localhost:3000"
+_EQUITY_ENDPOINT = f"{EQUITY_SERVICE_URL}/calculate-equity"
+_EQUITY_BATCH_ENDPOINT = f"{EQUITY_SERVICE_URL}/calculate-equity-batch"
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+class EquityServiceError(Exception):
+    """Raised when the equity calculator service fails or reports an error."""
+
+class EquityServiceUnavailable(EquityServiceError):
+    """Raised when the equity calculator service cannot be reached (connection error or timeout)."""
+
+# Precomputed equities per canonical matchup (see precompute_equity.py), consulted
+# before the equity service when the file is present.
+EQUITY_TABLE_PATH = "equity_table.pkl"
+# Recorded in the table file; only tables built from exact service results are loaded.
+EQUITY_TABLE_SOURCE = "equity service (exact)"
+
+# Unshuffled 52-card deck, built once and copied for every new hand.
+_FULL_DECK = tuple(rank + suit for rank in "23456789TJQKA" for suit in "hdcs")
+_DECK_ARRAY = np.array(_FULL_DECK)
+
+# Default generator used to shuffle decks; permuting the deck array runs in C rather
+# than in the interpreter. Pass shuffle_deck a seeded generator for reproducible deals.
+_deck_rng = np.random.default_rng()
+
+def shuffle_deck(rng=None):
     """
     Create a standard 52-card deck and shuffle it.
     
@@ -18,14 +77,16 @@ def shuffle_deck():
       - Ranks: '2', '3', '4', '5', '6', '7', '8', '9', 'T', 'J', 'Q', 'K', 'A'
       - Suits: 'h' (hearts), 'd' (diamonds), 'c' (clubs), 's' (spades)
       
+    Args:
+        rng (np.random.Generator): Optional generator to shuffle with, e.g. a seeded one
+                                   for reproducible deals. Defaults to a module-level generator.
+      
     Returns:
         list: A list of 52 shuffled card strings.
     """
-    ranks = "23456789TJQKA"
-    suits = "hdcs"
-    deck = [rank + suit for rank in ranks for suit in suits]
-    random.shuffle(deck)
-    return deck
+    if rng is None:
+        rng = _deck_rng
+    return rng.permutation(_DECK_ARRAY).tolist()
 
 def deal(deck):
     """
@@ -50,46 +111,260 @@ def deal(deck):
     player2_hand = deck[1] + deck[3]
     return player1_hand, player2_hand
 
-def calculate_equity(player1_hand, player2_hand):
+def calculate_equity(player1_hand, player2_hand, use_local=False):
     """
     Calls the Node.js equity calculator service via HTTP POST to calculate
     pre-flop equities for two hands. The returned equity percentages are divided by 100
     to convert them to decimals. If the sum of the decimals is less than 1, the missing
     equity is split equally between the two players to ensure the equities sum to 1.
     
+    Results are cached per canonical matchup (see _canonical_matchup), so matchups that
+    only differ by suit labels or card order within a hand, e.g. "AhKh" vs "QsJd" and
+    "AsKs" vs "JhQc", share a single service call. Use _service_equity.cache_clear()
+    to drop the cache. If a precomputed table (EQUITY_TABLE_PATH, written by
+    precompute_equity.py) was present at import, matchups are looked up there first.
+    
+    Matchups missing from the table are estimated in-process by
+    local_equity.monte_carlo_equity (Monte-Carlo noise ~0.005) when the service cannot
+    be reached, i.e. on a connection error or timeout (a RuntimeWarning is issued), or
+    always when use_local=True. Local estimates are cached per canonical matchup too (see
+    _local_equity), so a matchup keeps the same equities for the whole run.
+    
     Parameters:
       player1_hand (str): Player 1's hand, e.g., "AcKh"
       player2_hand (str): Player 2's hand, e.g., "QsJd"
+      use_local (bool): Always estimate locally instead of calling the service.
       
     Returns:
       tuple: (player1_equity, player2_equity) as floats in decimal form summing to 1.
     
     Raises:
-      Exception: When the request fails or the service returns an error.
+      EquityServiceError: When the service responds with an error (e.g., an HTTP error status).
+    """
+    matchup = _canonical_matchup(player1_hand, player2_hand)
+    equities = _equity_table.get(matchup)
+    if equities is not None:
+        return equities
+    if use_local:
+        return _local_equity(*matchup)
+    try:
+        return _service_equity(*matchup)
+    except EquityServiceUnavailable as e:
+        # Only an unreachable service falls back; errors it responds with are raised.
+        warnings.warn(f"{e}; estimating equities locally instead.", RuntimeWarning)
+        return _local_equity(*matchup)
+
+def _canonical_matchup(player1_hand, player2_hand):
+    """
+    Reduces a matchup to a canonical representative that has the same equities.
+    
+    Suits are relabeled in order of first appearance ('h', 'd', 'c', 's') and every
+    ordering of the two cards within each hand is tried; the lexicographically
+    smallest result is the canonical form. Player order is preserved.
+    
+    Parameters:
+      player1_hand (str): Player 1's hand, e.g., "AcKh"
+      player2_hand (str): Player 2's hand, e.g., "QsJd"
+      
+    Returns:
+      tuple: (player1_hand, player2_hand) in canonical form.
+    """
+    best = None
+    for hand1 in (player1_hand, player1_hand[2:] + player1_hand[:2]):
+        for hand2 in (player2_hand, player2_hand[2:] + player2_hand[:2]):
+            suit_map = {}
+            key = ""
+            for rank, suit in (hand1[0:2], hand1[2:4], hand2[0:2], hand2[2:4]):
+                if suit not in suit_map:
+                    suit_map[suit] = "hdcs"[len(suit_map)]
+                key += rank + suit_map[suit]
+            if best is None or key < best:
+                best = key
+    return best[:4], best[4:]
+
+def canonical_matchups():
+    """
+    Lists every distinct canonical matchup (see _canonical_matchup), i.e. one
+    representative per class of equivalent two-hand preflop matchups.
+    
+    Returns:
+      list: Sorted (player1_hand, player2_hand) tuples.
+    """
+    # Any matchup is equivalent to one whose first card is a heart and second card a
+    # heart or diamond, so only those player 1 hands need to be enumerated.
+    player1_hands = [
+        card1 + card2 for card1 in _FULL_DECK for card2 in _FULL_DECK
+        if card1 != card2 and card1[1] == "h" and card2[1] in "hd"
+    ]
+    matchups = set()
+    for hand1 in player1_hands:
+        for card1 in _FULL_DECK:
+            for card2 in _FULL_DECK:
+                if card1 < card2 and card1 not in (hand1[0:2], hand1[2:4]) and card2 not in (hand1[0:2], hand1[2:4]):
+                    matchups.add(_canonical_matchup(hand1, card1 + card2))
+    return sorted(matchups)
+
+def _load_equity_table(path=EQUITY_TABLE_PATH):
+    """
+    Loads the precomputed equity table if the file exists, otherwise returns an empty dict.
+    
+    Raises:
+      ValueError: If the file does not record EQUITY_TABLE_SOURCE, i.e. it was not written
+                  by precompute_equity.py from exact equity service results.
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, "rb") as f:
+        table = pickle.load(f)
+    if not isinstance(table, dict) or table.get("source") != EQUITY_TABLE_SOURCE:
+        raise ValueError(
+            f"{path} was not built from exact equity service results; "
+            "delete it and rerun precompute_equity.py."
+        )
+    return table["equities"]
+
+_equity_table = _load_equity_table()
+
+@functools.lru_cache(maxsize=200_000)
+def _local_equity(player1_hand, player2_hand):
+    """
+    Estimates the equities for one matchup in-process with local_equity.monte_carlo_equity.
+    Cached like _service_equity; use _local_equity.cache_clear() to drop the cache.
+    """
+    return monte_carlo_equity(player1_hand, player2_hand)
+
+@functools.lru_cache(maxsize=200_000)
+def _service_equity(player1_hand, player2_hand):
+    """
+    Requests the equities for one matchup from the equity calculator service.
+    See calculate_equity for the returned values and raised errors.
     """
-    url = "http://localhost:3000/calculate-equity"
     payload = {
         "player1Hand": player1_hand,
         "player2Hand": player2_hand
     }
-    headers = {"Content-Type": "application/json"}
     
     try:
-        response = requests.post(url, json=payload, headers=headers)
+        response = _post_json(_EQUITY_ENDPOINT, payload)
         # Raise an error if the response contains an HTTP error status
         response.raise_for_status()
+    except (requests.ConnectionError, requests.Timeout) as e:
+        raise EquityServiceUnavailable(f"Error calling the equity calculator service: {e}") from e
     except requests.RequestException as e:
-        raise Exception(f"Error calling the equity calculator service: {e}")
+        raise EquityServiceError(f"Error calling the equity calculator service: {e}") from e
     
     # Parse the JSON response
-    data = response.json()
+    data = _parse_json(response)
     if "error" in data:
         # Optionally, inspect data['message'] for more details if available
-        raise Exception(f"Service returned an error: {data['error']}")
+        raise EquityServiceError(f"Service returned an error: {data['error']}")
+
+    return _normalize_equities(data["player1Equity"], data["player2Equity"])
+
+def calculate_equity_batch(hand_pairs):
+    """
+    Calculates pre-flop equities for many matchups with a single HTTP POST to the
+    equity calculator service's batch route, so the per-request overhead is paid once.
+    Each result is normalized exactly like calculate_equity.
+    
+    If the service does not have the batch route (a 404, e.g., an older server without
+    it), the matchups are requested from the service one at a time instead. Results
+    always come from the service: the precomputed table and local estimates are not used.
+    
+    Parameters:
+      hand_pairs (list): (player1_hand, player2_hand) tuples, e.g., [("AcKh", "QsJd")]
+      
+    Returns:
+      list: (player1_equity, player2_equity) tuples aligned with hand_pairs.
+    
+    Raises:
+      EquityServiceUnavailable: When the service cannot be reached.
+      EquityServiceError: When the service responds with any other error status or reports an error.
+    """
+    if not hand_pairs:
+        return []
+
+    payload = {
+        "jobs": [{"player1Hand": p1, "player2Hand": p2} for p1, p2 in hand_pairs]
+    }
+
+    try:
+        response = _post_json(_EQUITY_BATCH_ENDPOINT, payload)
+    except (requests.ConnectionError, requests.Timeout) as e:
+        raise EquityServiceUnavailable(f"Error calling the equity calculator service: {e}") from e
+    except requests.RequestException as e:
+        raise EquityServiceError(f"Error calling the equity calculator service: {e}") from e
+
+    if response.status_code == 404:
+        # No batch route: fall back to one service request per matchup.
+        return [_service_equity(*_canonical_matchup(p1, p2)) for p1, p2 in hand_pairs]
+    if response.status_code != 200:
+        raise EquityServiceError(
+            f"Error calling the equity calculator service: batch request returned HTTP {response.status_code}"
+        )
+
+    data = _parse_json(response)
+    if "error" in data:
+        raise EquityServiceError(f"Service returned an error: {data['error']}")
+
+    return [
+        _normalize_equities(result["player1Equity"], result["player2Equity"])
+        for result in data["results"]
+    ]
 
+def calculate_equity_many(hand_pairs, max_workers=16):
+    """
+    Calculates pre-flop equities for many matchups by issuing concurrent
+    calculate_equity requests from a thread pool. The calls are I/O-bound on the
+    equity calculator service, so they overlap instead of waiting on each other.
+    Use this when the service does not provide the batch route.
+    
+    Parameters:
+      hand_pairs (list): (player1_hand, player2_hand) tuples, e.g., [("AcKh", "QsJd")]
+      max_workers (int): Maximum number of requests in flight at once.
+      
+    Returns:
+      list: (player1_equity, player2_equity) tuples aligned with hand_pairs.
+    
+    Raises:
+      EquityServiceError: When the service responds with an error. Matchups are
+                          estimated locally if it cannot be reached, as in calculate_equity.
+    """
+    if not hand_pairs:
+        return []
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda pair: calculate_equity(*pair), hand_pairs))
+
+def _post_json(url, payload):
+    """
+    POSTs a JSON payload on the shared equity service session, encoding it with
+    orjson when it is installed.
+    """
+    if orjson is None:
+        return _equity_session.post(url, json=payload, headers=_JSON_HEADERS)
+    return _equity_session.post(url, data=orjson.dumps(payload), headers=_JSON_HEADERS)
+
+def _parse_json(response):
+    """Decodes a JSON response body, using orjson when it is installed."""
+    if orjson is None:
+        return response.json()
+    return orjson.loads(response.content)
+
+def _normalize_equities(equity1, equity2):
+    """
+    Converts the percentage equities returned by the service into decimals that sum to 1.
+    
+    Parameters:
+      equity1: Player 1's equity percentage (number or numeric string).
+      equity2: Player 2's equity percentage (number or numeric string).
+      
+    Returns:
+      tuple: (player1_equity, player2_equity) rounded to 3 decimal places.
+    """
     # Get and convert the returned equity values to floats
-    equity1 = float(data["player1Equity"])
-    equity2 = float(data["player2Equity"])
+    equity1 = float(equity1)
+    equity2 = float(equity2)
     
     # Convert percentage equities into decimals
     equity1 /= 100
@@ -107,6 +382,7 @@ def calculate_equity(player1_hand, player2_hand):
     equity2 = round(equity2, 3)
     
     return equity1, equity2
+
 # Dictionary of 169 Texas Hold’em starting hands mapped to their estimated equity vs. a random hand.
 hand_vs_random = {
     # Pocket Pairs (13 hands)
@@ -185,6 +461,11 @@ hand_vs_random = {
     "32o": 0.43,
 }
 
+# Canonical ordering of the 169 starting hand classes and the reverse lookup,
+# so per-hand statistics can be stored in flat arrays indexed by class id.
+HAND_CLASSES = tuple(hand_vs_random)
+HAND_CLASS_INDEX = {hand: i for i, hand in enumerate(HAND_CLASSES)}
+
 def estimate_equity(hand: str) -> float:
     """
     Given a classified Texas Hold'em starting hand (e.g., 'AA', 'AKs', 'AKo'),
@@ -205,6 +486,17 @@ def estimate_equity(hand: str) -> float:
     except KeyError:
         raise ValueError(f"Hand '{hand}' not found in the equity lookup table.")
 
+# Rank -> strength order ("2" lowest, "A" highest).
+RANK_VALUE = {rank: i for i, rank in enumerate("23456789TJQKA")}
+
+# Ordered rank pairs that count as connected: adjacent ranks in "23456789TJQK", plus
+# the wheel (Ace-2) and Ace-King, in both orders.
+CONNECTED_PAIRS = frozenset(
+    [(low, high) for low, high in zip("23456789TJQ", "3456789TJQK")]
+    + [(high, low) for low, high in zip("23456789TJQ", "3456789TJQK")]
+    + [("A", "2"), ("2", "A"), ("A", "K"), ("K", "A")]
+)
+
 def classify_hand(hand):
     """
     Classifies a poker hand based on the input string and returns an equity estimate.
@@ -223,9 +515,19 @@ def classify_hand(hand):
                             False otherwise; for pairs, connected is always False.
                - estimated_equity: The estimated winning equity (a float between 0 and 1) versus a random hand.
     
+    Results for every 4-character hand made of two distinct cards are precomputed at
+    import time (_CLASSIFY_CACHE); other inputs fall back to _classify_hand_uncached.
+    
     Raises:
         ValueError: If the hand is not exactly 4 characters.
     """
+    try:
+        return _CLASSIFY_CACHE[hand]
+    except (KeyError, TypeError):
+        return _classify_hand_uncached(hand)
+
+def _classify_hand_uncached(hand):
+    """Computes classify_hand's result for a hand without consulting the cache."""
     if len(hand) != 4:
         raise ValueError("Hand must be a string of exactly four characters.")
 
@@ -243,8 +545,11 @@ def classify_hand(hand):
         return classified, suited, pair, connected, estimated_equity
 
     # For non-pair hands, order the ranks by "greatness".
-    greatness_order = "23456789TJQKA"
-    if greatness_order.index(rank1) > greatness_order.index(rank2):
+    try:
+        value1, value2 = RANK_VALUE[rank1], RANK_VALUE[rank2]
+    except KeyError:
+        raise ValueError(f"Invalid card rank in hand '{hand}'.") from None
+    if value1 > value2:
         ordered_ranks = rank1 + rank2
     else:
         ordered_ranks = rank2 + rank1
@@ -254,23 +559,7 @@ def classify_hand(hand):
     pair = False
 
     # Determine if the two ranks are connected.
-    connected_pairs = set()
-    connectivity_string = "23456789TJQK"
-    for i in range(len(connectivity_string) - 1):
-        pair_tuple = (connectivity_string[i], connectivity_string[i+1])
-        connected_pairs.add(pair_tuple)
-        connected_pairs.add((connectivity_string[i+1], connectivity_string[i]))
-    # Add wheel connectivity: Ace and 2.
-    connected_pairs.add(("A", "2"))
-    connected_pairs.add(("2", "A"))
-    # Add Ace-King connectivity.
-    connected_pairs.add(("A", "K"))
-    connected_pairs.add(("K", "A"))
-    
-    if (rank1, rank2) in connected_pairs or (rank2, rank1) in connected_pairs:
-        connected = True
-    else:
-        connected = False
+    connected = (rank1, rank2) in CONNECTED_PAIRS
 
     # Determine the suffix ("s" for suited, "o" for offsuit).
     suffix = "s" if suited else "o"
@@ -281,6 +570,12 @@ def classify_hand(hand):
 
     return classified, suited, pair, connected, estimated_equity
 
+# classify_hand results for every ordered pair of distinct cards (2,652 hands).
+_CLASSIFY_CACHE = {
+    card1 + card2: _classify_hand_uncached(card1 + card2)
+    for card1 in _FULL_DECK for card2 in _FULL_DECK if card1 != card2
+}
+
 def calculate_reward_no_fold(equity1: float, equity2: float, contributions: dict) -> tuple:
     """
     Calculate the reward for two players when neither player folds,
@@ -422,6 +717,20 @@ def calculate_implied_probability(contributions):
 # Restructured Functions (previously using mdp_components)
 # ============================================================
 
+# Structured betting history before any action has been taken; callers get copies.
+_EMPTY_STRUCTURED_HISTORY = {
+    "num_actions": 0,
+    "num_raises": 0,
+    "num_calls": 0,
+    "num_checks": 0,
+    "last_action_type": 0,  # 0 means no action yet
+    "last_action_player": 0,  # 0 means no player yet
+    "last_action_amount": 0,
+    "last_raise_size": 0,
+    "btn_aggression": 0,
+    "bb_aggression": 0
+}
+
 def format_betting_history_for_rl(betting_history):
     """
     Converts the raw betting history into a structured format suitable for reinforcement learning.
@@ -443,55 +752,49 @@ def format_betting_history_for_rl(betting_history):
             - bb_aggression: Ratio of raises to total actions by BB
     """
     if not betting_history:
-        return {
-            "num_actions": 0,
-            "num_raises": 0,
-            "num_calls": 0,
-            "num_checks": 0,
-            "last_action_type": 0,  # 0 means no action yet
-            "last_action_player": 0,  # 0 means no player yet
-            "last_action_amount": 0,
-            "last_raise_size": 0,
-            "btn_aggression": 0,
-            "bb_aggression": 0
-        }
-    
-    # Count actions by type
-    num_raises = sum(1 for action in betting_history if action['action'] == 'raise')
-    num_calls = sum(1 for action in betting_history if action['action'] == 'call')
-    num_checks = sum(1 for action in betting_history if action['action'] == 'check')
+        return dict(_EMPTY_STRUCTURED_HISTORY)
+    
+    # Count actions by type and by player in a single pass. The size of the last raise
+    # is measured from the most recent amount before it.
+    num_raises = num_calls = num_checks = 0
+    btn_total = btn_raises = bb_total = bb_raises = 0
+    last_raise_size = 0
+    prev_amount = 0
+    for action in betting_history:
+        act = action['action']
+        player = action['player']
+        amount = action.get('amount')
+        if act == 'raise':
+            num_raises += 1
+            if amount is not None:
+                last_raise_size = amount - prev_amount
+        elif act == 'call':
+            num_calls += 1
+        elif act == 'check':
+            num_checks += 1
+        
+        if player == 'BTN':
+            btn_total += 1
+            if act == 'raise':
+                btn_raises += 1
+        elif player == 'BB':
+            bb_total += 1
+            if act == 'raise':
+                bb_raises += 1
+        
+        if amount is not None:
+            prev_amount = amount
     
     # Get the last action information
     last_action = betting_history[-1]
-    last_action_type = {
-        'fold': 1,
-        'check': 2,
-        'call': 3,
-        'raise': 4
-    }.get(last_action['action'], 0)
+    last_action_type = _ACTION_TYPE_CODE.get(last_action['action'], 0)
     
     last_action_player = 1 if last_action['player'] == 'BTN' else 2
-    last_action_amount = last_action.get('amount', 0) if 'amount' in last_action else 0
-    
-    # Calculate last raise size
-    last_raise_size = 0
-    for action in reversed(betting_history):
-        if action['action'] == 'raise' and 'amount' in action:
-            # Find the previous bet to calculate the raise size
-            prev_bet = 0
-            for prev_action in reversed(betting_history[:betting_history.index(action)]):
-                if 'amount' in prev_action:
-                    prev_bet = prev_action['amount']
-                    break
-            last_raise_size = action['amount'] - prev_bet
-            break
+    last_action_amount = last_action.get('amount', 0)
     
     # Calculate aggression metrics
-    btn_actions = [a for a in betting_history if a['player'] == 'BTN']
-    bb_actions = [a for a in betting_history if a['player'] == 'BB']
-    
-    btn_aggression = sum(1 for a in btn_actions if a['action'] == 'raise') / len(btn_actions) if btn_actions else 0
-    bb_aggression = sum(1 for a in bb_actions if a['action'] == 'raise') / len(bb_actions) if bb_actions else 0
+    btn_aggression = btn_raises / btn_total if btn_total else 0
+    bb_aggression = bb_raises / bb_total if bb_total else 0
     
     return {
         "num_actions": len(betting_history),
@@ -506,6 +809,50 @@ def format_betting_history_for_rl(betting_history):
         "bb_aggression": bb_aggression
     }
 
+@functools.lru_cache(maxsize=4096)
+def _enumerate_raise_targets(player_contribution: float, remaining: float, current_bet: float,
+                             opponent_contributions: Optional[float]) -> Tuple[float, ...]:
+    """
+    Lists the total contributions a player may raise to. Shared by get_available_actions
+    and BB_actions; results are cached since the same few contribution and stack
+    combinations recur throughout training.
+    
+    Parameters:
+        player_contribution (float): The player's current contribution.
+        remaining (float): The player's remaining stack after calling.
+        current_bet (float): The amount the player is required to call.
+        opponent_contributions (float): The opponent's total contribution, or None.
+    
+    Returns:
+        tuple: The allowed raise targets, followed by the all-in total if it is not already included.
+    """
+    # Determine the minimum allowed new total contribution if the player raises.
+    # If opponent_contributions is provided, then the raise must bring the player's total
+    # to at least: player_contribution + 2 × opponent_contributions.
+    # Otherwise, default to a minimum target of 2.0.
+    if opponent_contributions is not None:
+        min_target = player_contribution + 2 * opponent_contributions
+    else:
+        min_target = 2.0
+
+    # Each discrete target is a valid option only if:
+    #   - It exceeds the player's current contribution,
+    #   - It is at least as high as min_target,
+    #   - And the additional amount (target - current contribution) is affordable (<= remaining).
+    raise_options = [
+        target for target in _DISCRETE_TARGETS
+        if target >= min_target and target > player_contribution
+        and (target - player_contribution) <= remaining
+    ]
+    
+    # Always include an "all in" option if it yields a total contribution
+    # that is above the current bet and isn’t already in the list.
+    all_in_total = player_contribution + remaining
+    if all_in_total > current_bet and all_in_total not in raise_options:
+        raise_options.append(all_in_total)
+    
+    return tuple(raise_options)
+
 def get_available_actions(current_bet: float, player_stack: float, is_dealer: bool, 
                           opponent_contributions: float = None) -> List[Dict[str, Any]]:
     """
@@ -525,14 +872,10 @@ def get_available_actions(current_bet: float, player_stack: float, is_dealer: bo
     Returns:
         A list of dictionaries representing the available actions.
         For a raise action, the dictionary has a key 'raise_amount' indicating the new total contribution target.
+        The fold and call dictionaries are shared between calls and must not be modified.
     """
-    actions = []
-    
-    # Option 1: Always allow folding.
-    actions.append({'action_type': 'fold'})
-    
-    # Option 2: Always allow calling.
-    actions.append({'action_type': 'call'})
+    # Options 1 and 2: Always allow folding and calling.
+    actions = [_FOLD_ACTION, _CALL_ACTION]
     
     # Determine the player's current contribution.
     # Pre-flop, by convention:
@@ -546,38 +889,11 @@ def get_available_actions(current_bet: float, player_stack: float, is_dealer: bo
     # Compute the remaining stack after calling.
     remaining = player_stack - to_call
     
-    # Determine the minimum allowed new total contribution if the player raises.
-    # If opponent_contributions is provided, then the raise must bring the player's total
-    # to at least: player_contribution + 2 × opponent_contributions.
-    # Otherwise, default to a minimum target of 2.0.
-    if opponent_contributions is not None:
-        min_target = player_contribution + 2 * opponent_contributions
-    else:
-        min_target = 2.0
-
-    # Allowed discrete targets for total contribution after a raise.
-    discrete_targets = [2, 3, 4, 5, 9, 15, 25, 50]
-    raise_options = []
-    
-    # For each discrete target, the option is valid only if:
-    #   - It exceeds the player's current contribution,
-    #   - It is at least as high as min_target,
-    #   - And the additional amount (target - current contribution) is affordable (<= remaining).
-    for target in discrete_targets:
-        if target < min_target or target <= player_contribution:
-            continue
-        if (target - player_contribution) <= remaining:
-            raise_options.append(target)
-    
-    # Always include an "all in" option if it yields a total contribution
-    # that is above the current bet and isn’t already in the list.
-    all_in_total = player_contribution + remaining
-    if all_in_total > current_bet and all_in_total not in raise_options:
-        raise_options.append(all_in_total)
-    
     # Add raise options to the action list.
-    for option in raise_options:
-        actions.append({'action_type': 'raise', 'raise_amount': option})
+    actions += [
+        {'action_type': 'raise', 'raise_amount': option}
+        for option in _enumerate_raise_targets(player_contribution, remaining, current_bet, opponent_contributions)
+    ]
     
     return actions
 
@@ -597,11 +913,10 @@ def BB_actions(player_stack: float, opponent_contributions: float) -> List[Dict[
     Returns:
         A list of dictionaries representing the available actions.
         For raise actions, the 'raise_amount' indicates the new total contribution target.
+        The check dictionary is shared between calls and must not be modified.
     """
-    actions = []
-    
     # Option 1: Offer the check action.
-    actions.append({'action_type': 'check'})
+    actions = [_CHECK_ACTION]
     
     # For BB, the current contribution is fixed at 1.0.
     player_contribution = 1.0
@@ -610,27 +925,10 @@ def BB_actions(player_stack: float, opponent_contributions: float) -> List[Dict[
     to_call = max(0, current_bet - player_contribution)
     remaining = player_stack - to_call
     
-    # Use opponent_contributions to determine the minimum new total target for a raise.
-    if opponent_contributions is not None:
-        min_target = player_contribution + 2 * opponent_contributions
-    else:
-        min_target = 2.0
-    
-    discrete_targets = [2, 3, 4, 5, 9, 15, 25, 50]
-    raise_options = []
-    
-    for target in discrete_targets:
-        if target < min_target or target <= player_contribution:
-            continue
-        if (target - player_contribution) <= remaining:
-            raise_options.append(target)
-    
-    all_in_total = player_contribution + remaining
-    if all_in_total > current_bet and all_in_total not in raise_options:
-        raise_options.append(all_in_total)
-    
-    for option in raise_options:
-        actions.append({'action_type': 'raise', 'raise_amount': option})
+    actions += [
+        {'action_type': 'raise', 'raise_amount': option}
+        for option in _enumerate_raise_targets(player_contribution, remaining, current_bet, opponent_contributions)
+    ]
         
     return actions
 
@@ -664,34 +962,28 @@ def get_state(player_position, player_hand, stack_sizes, contributions, betting_
     pot_size = calculate_pot(contributions)
     
     # 3. Determine the opponent's position
-    opponent_position = 'BB' if player_position == 'BTN' else 'BTN'
+    opponent_position = OPPONENT[player_position]
     
     # 4. Calculate current bet to call
     player_contribution = contributions.get(player_position, 0)
     opponent_contribution = contributions.get(opponent_position, 0)
     current_bet_to_call = max(0, opponent_contribution - player_contribution)
     
-    # 5. Determine the last raise size (if any)
-    last_raise_size = None
-    for action in reversed(betting_history):
-        if action['action'] == 'raise' and 'amount' in action:
-            # Find the previous bet to calculate the raise size
-            prev_bet = 0
-            for prev_action in reversed(betting_history[:betting_history.index(action)]):
-                if 'amount' in prev_action:
-                    prev_bet = prev_action['amount']
-                    break
-            last_raise_size = action['amount'] - prev_bet
-            break
-    
-    # 6. Calculate implied probability (if applicable)
+    # 5. Format betting history for reinforcement learning and
+    # 6. determine the last raise size (None if there was no raise)
+    if betting_history:
+        structured_history = format_betting_history_for_rl(betting_history)
+        last_raise_size = structured_history['last_raise_size'] or None
+    else:
+        # Opening decision: nothing has been bet yet.
+        structured_history = dict(_EMPTY_STRUCTURED_HISTORY)
+        last_raise_size = None
+    
+    # 7. Calculate implied probability (if applicable)
     implied_probability = None
     if current_bet_to_call > 0:
         implied_probability = calculate_implied_probability(contributions)
     
-    # 7. Format betting history for reinforcement learning
-    structured_history = format_betting_history_for_rl(betting_history)
-    
     # 8. Create and return the complete state object as a dictionary
     state = {
         'my_hole_cards': hole_cards,
@@ -708,6 +1000,9 @@ def get_state(player_position, player_hand, stack_sizes, contributions, betting_
     
     return state
 
+# Pairs flagged by the premium pair feature of get_state_vector_for_deep_rl.
+_PREMIUM_PAIRS = frozenset(('AA', 'KK', 'QQ'))
+
 def get_state_vector_for_deep_rl(state_dict):
     """Enhanced state vector optimized for deep learning algorithms
     
@@ -717,41 +1012,52 @@ def get_state_vector_for_deep_rl(state_dict):
     Returns:
         list: A normalized vector suitable for neural network input
     """
+    # Read each state field once.
+    position = state_dict['position']
+    hole_cards = state_dict['my_hole_cards']
+    stack_sizes = state_dict['stack_sizes']
+    pot_size = state_dict['pot_size']
+    last_raise_size = state_dict['last_raise_size']
+    implied_probability = state_dict['implied_probability']
+    structured_history = state_dict['structured_betting_history']
+    estimated_equity = hole_cards['estimated_equity']
+    pair = hole_cards['pair']
+    my_stack = stack_sizes[position]
+    
     # Create a normalized vector with position encoding
-    position_encoding = 1.0 if state_dict['position'] == "BTN" else 0.0
+    position_encoding = 1.0 if position == "BTN" else 0.0
     
     state_vector = [
         # Position information (one-hot encoded)
         position_encoding,
         
         # Hand strength features
-        state_dict['my_hole_cards']['estimated_equity'],
-        int(state_dict['my_hole_cards']['suited']),
-        int(state_dict['my_hole_cards']['pair']),
-        int(state_dict['my_hole_cards']['connected']),
+        estimated_equity,
+        int(hole_cards['suited']),
+        int(pair),
+        int(hole_cards['connected']),
         
         # Additional hand strength indicators (derived features)
-        1.0 if state_dict['my_hole_cards']['estimated_equity'] > 0.70 else 0.0,  # Premium hand indicator
-        1.0 if (state_dict['my_hole_cards']['pair'] and 
-                state_dict['my_hole_cards']['classified'] in ['AA', 'KK', 'QQ']) else 0.0,  # Premium pair
+        float(estimated_equity > 0.70),  # Premium hand indicator
+        float(pair and hole_cards['classified'] in _PREMIUM_PAIRS),  # Premium pair
         
         # Stack and pot information (normalized)
-        state_dict['stack_sizes'][state_dict['position']] / 100,
-        state_dict['stack_sizes']['BB' if state_dict['position'] == 'BTN' else 'BTN'] / 100,
-        state_dict['pot_size'] / 100,
+        my_stack / 100,
+        stack_sizes[OPPONENT[position]] / 100,
+        pot_size / 100,
         
         # Stack-to-pot ratio (SPR) - critical for decision making
-        (state_dict['stack_sizes'][state_dict['position']] / max(1.0, state_dict['pot_size'])),
+        (my_stack / max(1.0, pot_size)),
         
         # Betting dynamics
         state_dict['current_bet_to_call'] / 100,
-        state_dict['last_raise_size'] / 100 if state_dict['last_raise_size'] else 0.0,
-        state_dict['implied_probability'] if state_dict['implied_probability'] is not None else 0.0,
+        last_raise_size / 100 if last_raise_size else 0.0,
+        implied_probability if implied_probability is not None else 0.0,
         
         # Betting history features
-        state_dict['structured_betting_history']['btn_aggression'],
-        state_dict['structured_betting_history']['bb_aggression'],
-        state_dict['structured_betting_history']['num_raises'] / 5,
+        structured_history['btn_aggression'],
+        structured_history['bb_aggression'],
+        structured_history['num_raises'] / 5,
         float(state_dict['is_first_action'])
     ]
     